@@ -1,13 +1,53 @@
+import asyncio
+import contextlib
+import logging
+import os
+import time
+from typing import Literal
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
-from fastapi.responses import FileResponse
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from ffmpeg import create_video_with_audio
-from xtts import generate_voice_clone
+from starlette.background import BackgroundTask
+from ffmpeg import HAS_NVENC, build_video_command
+from xtts import generate_voice_audio, load_model
+
+logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+log = logging.getLogger(__name__)
 
 app = FastAPI()
 
+# Large pipe between ffmpeg and us so the encoder isn't stalled on a 64KB pipe.
+PIPE_BUFFER_SIZE = 8 * 1024 * 1024
+STREAM_CHUNK_SIZE = 1024 * 1024
+
+# Blocking work runs off the event loop. One GPU worker, since the model is
+# serialized anyway; encode prep (probe + subtitles) gets its own pool so the
+# next request's synthesis overlaps the previous request's encode.
+_GPU_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tts")
+_ENC_POOL = ThreadPoolExecutor(max_workers=4, thread_name_prefix="encode")
+
+# libx264 encodes already spread across every CPU, so running more than a couple
+# at once only thrashes. NVENC moves the encode to the GPU, where the limit is the
+# number of encoder sessions (3 on older consumer cards). Extra requests queue for a slot.
+MAX_CONCURRENT_ENCODES = 3 if HAS_NVENC else 2
+_encode_slots = asyncio.Semaphore(MAX_CONCURRENT_ENCODES)
+
+# How long a request may queue for a slot before it gets an error instead
+SLOT_WAIT_TIMEOUT = 60
+# Upper bound on how long one stream may hold a slot, so a stalled client
+# can't pin its ffmpeg process (and the slot) forever
+MAX_STREAM_SECONDS = 600
+
+X264Preset = Literal[
+    "ultrafast", "superfast", "veryfast", "faster", "fast",
+    "medium", "slow", "slower", "veryslow",
+]
+
 class VoiceRequest(BaseModel):
     text: str
+    # Latency-first by default; quality-critical callers can ask for slower
+    preset: X264Preset = "veryfast"
 
 class RenderRequest(BaseModel):
     hook: str
@@ -16,6 +56,155 @@ class RenderRequest(BaseModel):
 class RenderResponse(BaseModel):
     video_path: str
 
+@app.on_event("startup")
+async def preload_tts_model():
+    # Warm up on the thread that serves synthesis, keeping the event loop free.
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(_GPU_POOL, load_model)
+
+
+def _pipe_max_size() -> int:
+    """fs.pipe-max-size caps F_SETPIPE_SZ for unprivileged processes (1 MiB by default)."""
+    try:
+        with open("/proc/sys/fs/pipe-max-size") as f:
+            return int(f.read())
+    except (OSError, ValueError):
+        return PIPE_BUFFER_SIZE
+
+
+def _grow_pipe(fd: int) -> None:
+    """Best effort: enlarge a pipe to PIPE_BUFFER_SIZE, clamped to what the kernel allows."""
+    try:
+        import fcntl
+        set_pipe_size = fcntl.F_SETPIPE_SZ
+    except (ImportError, AttributeError):
+        log.debug("F_SETPIPE_SZ not available on this platform; keeping the default pipe size")
+        return
+
+    size = min(PIPE_BUFFER_SIZE, _pipe_max_size())
+    try:
+        fcntl.fcntl(fd, set_pipe_size, size)
+    except OSError as e:
+        log.debug("Could not resize ffmpeg output pipe to %d bytes: %s", size, e)
+
+
+async def _spawn_ffmpeg(cmd: list) -> tuple[asyncio.subprocess.Process, asyncio.StreamReader]:
+    """
+    Start ffmpeg with stdin/stderr pipes and its stdout on an enlarged pipe
+    wrapped in a StreamReader. All three are serviced by the event loop.
+    """
+    read_fd, write_fd = os.pipe()
+    _grow_pipe(read_fd)
+
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=write_fd,
+            stderr=asyncio.subprocess.PIPE,
+            close_fds=True,
+        )
+    except Exception:
+        os.close(read_fd)
+        raise
+    finally:
+        os.close(write_fd)
+
+    loop = asyncio.get_running_loop()
+    reader = asyncio.StreamReader(limit=PIPE_BUFFER_SIZE)
+    await loop.connect_read_pipe(
+        lambda: asyncio.StreamReaderProtocol(reader),
+        os.fdopen(read_fd, "rb", buffering=0),
+    )
+    return proc, reader
+
+
+async def _feed_stdin(proc: asyncio.subprocess.Process, data: bytes) -> None:
+    """Write the raw PCM voice track to ffmpeg while its output is being read."""
+    try:
+        proc.stdin.write(data)
+        await proc.stdin.drain()
+    except (BrokenPipeError, ConnectionResetError):
+        pass  # ffmpeg exited early; its exit code reports why
+    finally:
+        proc.stdin.close()
+
+
+def _remove_files(*paths: str) -> None:
+    for path in paths:
+        if path and os.path.exists(path):
+            os.remove(path)
+
+
+class _FfmpegStream:
+    """
+    A running ffmpeg encode and everything that must be released when it ends:
+    the stdin feeder, the stderr drain, the subtitle file and the encode slot.
+    It is force-closed after MAX_STREAM_SECONDS even if the client stops reading.
+    """
+
+    def __init__(self, proc: asyncio.subprocess.Process, reader: asyncio.StreamReader,
+                 pcm: bytes, ass_path: str):
+        self.proc = proc
+        self.reader = reader
+        self.ass_path = ass_path
+        # Started right away, so ffmpeg is fed even if the response is never iterated
+        self._feeder = asyncio.create_task(_feed_stdin(proc, pcm))
+        # Drained concurrently so a chatty ffmpeg can never block on a full stderr pipe
+        self._errors = asyncio.create_task(proc.stderr.read())
+        self._deadline = asyncio.get_running_loop().call_later(MAX_STREAM_SECONDS, self._expire)
+        self._closed = False
+
+    def _expire(self) -> None:
+        if not self._closed:
+            log.error("Stream exceeded %ss, killing ffmpeg", MAX_STREAM_SECONDS)
+            self.close()
+
+    async def error_output(self) -> str:
+        """Wait for ffmpeg to exit and return what it wrote to stderr."""
+        await self.proc.wait()
+        if self._errors.cancelled():
+            return ""  # closed (e.g. by the stream deadline) before stderr was read
+        return (await self._errors).decode(errors="replace").strip()
+
+    def close(self) -> None:
+        """
+        Kill ffmpeg if needed and release everything. Synchronous and idempotent,
+        so it runs to completion even while the calling task is being cancelled.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._deadline.cancel()
+        self._feeder.cancel()
+        self._errors.cancel()
+        if self.proc.returncode is None:
+            with contextlib.suppress(ProcessLookupError):
+                self.proc.kill()
+        _encode_slots.release()
+        with contextlib.suppress(OSError):
+            _remove_files(self.ass_path)
+
+    async def aclose(self) -> None:
+        self.close()
+
+
+async def _iter_video(stream: _FfmpegStream, first_chunk: bytes):
+    """Yield ffmpeg's MP4 output (starting with the already-read first chunk), then release the stream."""
+    try:
+        yield first_chunk
+        while chunk := await stream.reader.read(STREAM_CHUNK_SIZE):
+            yield chunk
+        if await stream.proc.wait() != 0:
+            log.error("ffmpeg exited with code %s: %s",
+                      stream.proc.returncode, await stream.error_output())
+    finally:
+        # Client disconnects land here too. Release first; reaping is best effort
+        # and may be cut short by repeated cancellation.
+        stream.close()
+        await stream.proc.wait()
+
+
 @app.get("/")
 async def read_root():
     return {"Hello": "World"}
@@ -26,16 +215,67 @@ async def health_check():
 
 @app.post("/generate-voice/")
 async def generate_voice(req: VoiceRequest):
+    loop = asyncio.get_running_loop()
     try:
-        if(generate_voice_clone(req.text)):
-            video_path = create_video_with_audio(req.text)
-            return FileResponse(
-                video_path,
+        # Audio stays in memory and is piped to ffmpeg, so concurrent requests
+        # never share a file
+        audio = await loop.run_in_executor(_GPU_POOL, generate_voice_audio, req.text)
+        if audio is not None:
+            samples, sample_rate = audio
+            cmd, ass_path = await loop.run_in_executor(
+                _ENC_POOL,
+                lambda: build_video_command(
+                    req.text,
+                    preset=req.preset,
+                    pcm_sample_rate=sample_rate,
+                    audio_duration=len(samples) / sample_rate,
+                ),
+            )
+            try:
+                try:
+                    await asyncio.wait_for(_encode_slots.acquire(), SLOT_WAIT_TIMEOUT)
+                except asyncio.TimeoutError:
+                    _remove_files(ass_path)
+                    log.error("No encode slot free after %ss", SLOT_WAIT_TIMEOUT)
+                    return {
+                        "message": "Server busy",
+                        "error": f"No encode slot became free within {SLOT_WAIT_TIMEOUT}s",
+                    }
+                try:
+                    proc, reader = await _spawn_ffmpeg(cmd)
+                except BaseException:
+                    _encode_slots.release()
+                    raise
+            except BaseException:
+                # Also covers the request being cancelled while queued for a slot
+                _remove_files(ass_path)
+                raise
+            stream = _FfmpegStream(proc, reader, samples.tobytes(), ass_path)
+            try:
+                # Wait for real output before committing to a 200 video/mp4, so
+                # startup failures (bad clip, missing filter, encoder init) still
+                # come back as an error body.
+                first_chunk = await reader.read(STREAM_CHUNK_SIZE)
+                if not first_chunk or proc.returncode not in (None, 0):
+                    error = await stream.error_output()
+                    stream.close()
+                    log.error("ffmpeg exited with code %s: %s", proc.returncode, error)
+                    return {
+                        "message": "Failed to render video",
+                        "error": error or f"ffmpeg exited with code {proc.returncode}",
+                    }
+            except BaseException:
+                stream.close()
+                raise
+            return StreamingResponse(
+                _iter_video(stream, first_chunk),
                 media_type="video/mp4",
-                filename=video_path.split('/')[-1]
+                headers={"Content-Disposition": f'attachment; filename="final_{int(time.time())}.mp4"'},
+                # Covers a response abandoned before its body is ever iterated
+                background=BackgroundTask(stream.aclose),
             )
         else:
-            return {"message": "Failed to generate voice clone", "error": "Voice generation returned False"}
+            return {"message": "Failed to generate voice clone", "error": "Voice generation returned no audio"}
     except Exception as e:
-        print(f"Error in generate_voice endpoint: {e}")
-        return {"message": "An error occurred", "error": str(e)}    
\ No newline at end of file
+        log.error("Error in generate_voice endpoint: %s", e)
+        return {"message": "An error occurred", "error": str(e)}
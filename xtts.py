@@ -1,28 +1,169 @@
-from TTS.api import TTS
-import torch
 import os
 
-def generate_voice_clone(text:str) -> bool:
-    os.environ["TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD"] = "1"
+os.environ["TORCH_FORCE_NO_WEIGHTS_ONLY_LOAD"] = "1"
+
+import logging
+import threading
+from contextlib import nullcontext
+from functools import lru_cache
+
+import numpy as np
+import torch
+from TTS.api import TTS
+
+log = logging.getLogger(__name__)
+
+MODEL_NAME = "tts_models/multilingual/multi-dataset/xtts_v2"
+SPEAKER_WAV = "./voice_clones/sample.mp3"
+WARMUP_TEXT = "Warming up the voice model."
+
+DEVICE = "cuda" if torch.cuda.is_available() else "cpu"
+
+# Half-precision autocast on GPU; the weights and buffers stay fp32. bf16 keeps
+# fp32's exponent range, which the GPT decoder needs to stay NaN-free; plain fp16
+# is only used where bf16 isn't supported.
+if DEVICE == "cuda":
+    DTYPE = torch.bfloat16 if torch.cuda.is_bf16_supported() else torch.float16
+else:
+    DTYPE = torch.float32
+
+torch.backends.cuda.matmul.allow_tf32 = True
+torch.backends.cudnn.allow_tf32 = True
+torch.backends.cudnn.benchmark = True
+torch.backends.cudnn.deterministic = False
+torch.set_float32_matmul_precision("high")
+
+# Dedicated stream so inference doesn't queue behind unrelated work on the default stream
+_infer_stream = torch.cuda.Stream() if DEVICE == "cuda" else None
+
+# The XTTS model is not reentrant on a single GPU, so synthesis is serialized.
+_tts_lock = threading.Lock()
+
+# Cleared (for the rest of the process) if a half-precision run ever produces NaN/inf.
+_use_autocast = DTYPE != torch.float32
+
+
+class _Fp32Module(torch.nn.Module):
+    """
+    Runs the wrapped module in fp32 with autocast off, so the waveform XTTS turns
+    into numpy is never bf16/fp16. Other attributes pass through to the wrapped module.
+    """
+
+    def __init__(self, module: torch.nn.Module):
+        super().__init__()
+        self.module = module
+
+    def forward(self, *args, **kwargs):
+        args = [_to_fp32(a) for a in args]
+        kwargs = {k: _to_fp32(v) for k, v in kwargs.items()}
+        with torch.autocast(DEVICE, enabled=False):
+            return self.module(*args, **kwargs)
+
+    def __getattr__(self, name):
+        try:
+            return super().__getattr__(name)
+        except AttributeError:
+            return getattr(self.module, name)
+
+
+def _to_fp32(value):
+    if torch.is_tensor(value) and value.is_floating_point():
+        return value.float()
+    return value
+
+
+@lru_cache(maxsize=1)
+def _get_tts() -> TTS:
+    """Load the XTTS model once and reuse it for every request."""
+    log.info("Using device: %s, autocast dtype: %s", DEVICE, DTYPE)
+    tts = TTS(MODEL_NAME).to(DEVICE)
+    tts.synthesizer.tts_model.eval()
+    if DEVICE == "cuda":
+        # XTTS is driven through .inference() rather than forward(), so compile
+        # the HiFiGAN decoder submodule, which is called through forward() per utterance.
+        # Default mode, not reduce-overhead: the input length changes with every
+        # utterance, and CUDA graphs would be re-recorded (and kept) per new length.
+        # It always runs in fp32; autocast only speeds up the GPT stage.
+        model = tts.synthesizer.tts_model
+        model.hifigan_decoder = _Fp32Module(torch.compile(
+            model.hifigan_decoder, fullgraph=False, dynamic=True
+        ))
+    return tts
+
+
+def _inference_context():
+    """Autocast to DTYPE while half precision is in use."""
+    if not _use_autocast:
+        return nullcontext()
+    return torch.autocast(DEVICE, dtype=DTYPE)
+
+
+def _synthesize(tts: TTS, text: str) -> np.ndarray:
+    """
+    Run one synthesis on the inference stream. If half precision yields NaN/inf,
+    fall back to fp32 for this and every later request.
+    Caller must hold _tts_lock.
+    """
+    global _use_autocast
+
+    with torch.inference_mode(), torch.cuda.stream(_infer_stream):
+        with _inference_context():
+            wav = np.asarray(
+                tts.tts(text=text, language="en", speaker_wav=SPEAKER_WAV), dtype=np.float32
+            )
+        if _use_autocast and not np.isfinite(wav).all():
+            log.warning("%s synthesis produced NaN/inf; falling back to fp32", DTYPE)
+            _use_autocast = False
+            wav = np.asarray(
+                tts.tts(text=text, language="en", speaker_wav=SPEAKER_WAV), dtype=np.float32
+            )
+    return wav
+
+
+def load_model() -> None:
+    """Load the model ahead of the first request (called at app startup)."""
+    with _tts_lock:
+        with torch.cuda.stream(_infer_stream):
+            tts = _get_tts()
+        if DEVICE == "cuda":
+            # Compile the dynamic-shape decoder now so the first real request isn't penalized.
+            # This also runs the half-precision NaN check once before serving.
+            _synthesize(tts, WARMUP_TEXT)
+
+
+def generate_voice_audio(text:str) -> tuple[np.ndarray, int] | None:
+    """
+    Synthesize text in memory. Returns (peak-normalized mono float32 samples,
+    sample rate), or None on failure.
+    """
     try:
         # Validate text input
         if not text or text.strip() == "":
-            print("Error: Text is empty or None")
-            return False
-        
-        device = "cuda" if torch.cuda.is_available() else "cpu"
-        print("Using device:", device)
-        print(f"Generating voice for text: {text[:50]}...")  # Print first 50 chars
-
-        tts = TTS("tts_models/multilingual/multi-dataset/xtts_v2").to(device)
-
-        tts.tts_to_file(
-            text=text.strip(),
-            file_path="final.wav",
-            language="en", 
-            speaker_wav="./voice_clones/sample.mp3",  # Changed from list to single string
-        )
+            log.error("Text is empty or None")
+            return None
+
+        log.info("Generating voice for text: %.50s...", text)
+
+        with _tts_lock:
+            with torch.cuda.stream(_infer_stream):
+                tts = _get_tts()
+            wav = _synthesize(tts, text.strip())
+        # Peak-normalize the same way TTS's save_wav does, so the piped track has
+        # the same level as a file written by tts_to_file / generate_voice_clone
+        wav *= 1 / max(0.01, np.abs(wav).max())
+        return wav, tts.synthesizer.output_sample_rate
+    except Exception as e:
+        log.error("Error during voice generation: %s", e)
+        return None
+
+
+def generate_voice_clone(text:str, file_path: str = "final.wav") -> bool:
+    audio = generate_voice_audio(text)
+    if audio is None:
+        return False
+    try:
+        _get_tts().synthesizer.save_wav(wav=audio[0], path=file_path)
         return True
     except Exception as e:
-        print("Error during voice generation:", e)
-        return False   
+        log.error("Error saving generated voice: %s", e)
+        return False